@@ -0,0 +1,235 @@
+import os
+import json
+import logging
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing as mp
+from pathlib import Path
+
+# Konfigurasi encoding (bisa di-override lewat environment)
+ENCODE_WORKERS = int(os.environ.get("ENCODE_WORKERS", 1))
+ENCODE_TOKEN_BUDGET = int(os.environ.get("ENCODE_TOKEN_BUDGET", 8192))
+ENCODE_MAX_BATCH_SIZE = int(os.environ.get("ENCODE_MAX_BATCH_SIZE", 256))
+ENCODE_CHUNK_WORDS = int(os.environ.get("ENCODE_CHUNK_WORDS", 128))
+ENCODE_CHUNK_OVERLAP = int(os.environ.get("ENCODE_CHUNK_OVERLAP", 16))
+
+# Backend inferensi: "torch" (float32) atau "onnx" (int8 dynamic quantization, CPU)
+ENCODER_BACKEND = os.environ.get("ENCODER_BACKEND", "torch")
+ONNX_QUANTIZATION = os.environ.get("ONNX_QUANTIZATION", "avx2")
+ONNX_MIN_COSINE = float(os.environ.get("ONNX_MIN_COSINE", 0.98))
+
+# Kalimat cadangan untuk validasi jika tidak ada held-out set dari korpus
+VALIDATION_TEXTS = [
+    "Deep learning methods for natural language processing",
+    "A survey of reinforcement learning in robotics",
+    "Quantum error correction with surface codes",
+    "Climate change impacts on coastal infrastructure",
+    "Graph neural networks for molecular property prediction",
+    "Economic effects of minimum wage policies",
+    "Self-assembly of nanoparticles in polymer matrices",
+    "Optimization of supply chains under uncertainty",
+]
+
+# Model per proses worker, dimuat sekali oleh initializer
+_worker_model = None
+
+def chunk_text(text, chunk_words=ENCODE_CHUNK_WORDS, overlap=ENCODE_CHUNK_OVERLAP):
+    """Split a text into overlapping word windows that fit the encoder's sequence length."""
+    words = (text or "").split()
+    if len(words) <= chunk_words:
+        return [" ".join(words)]
+
+    step = max(1, chunk_words - overlap)
+    chunks = []
+    for start in range(0, len(words), step):
+        chunks.append(" ".join(words[start:start + chunk_words]))
+        if start + chunk_words >= len(words):
+            break
+    return chunks
+
+def length_buckets(lengths, token_budget=ENCODE_TOKEN_BUDGET, max_batch_size=ENCODE_MAX_BATCH_SIZE):
+    """Group indices sorted by length into batches of at most `token_budget` padded tokens."""
+    order = np.argsort(lengths, kind="stable")
+    batches, current = [], []
+    for idx in order:
+        # Batch diurutkan naik, jadi panjang item terakhir = panjang padding batch
+        padded = (len(current) + 1) * max(1, lengths[idx])
+        if current and (padded > token_budget or len(current) >= max_batch_size):
+            batches.append(current)
+            current = []
+        current.append(int(idx))
+    if current:
+        batches.append(current)
+    return batches
+
+def _onnx_file_name():
+    return f"onnx/model_qint8_{ONNX_QUANTIZATION}.onnx"
+
+def _open_model(model_path, backend, num_threads=None):
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "onnx":
+        model_kwargs = {"file_name": _onnx_file_name()}
+        if num_threads:
+            import onnxruntime as ort
+
+            # onnxruntime punya pool thread sendiri (default: semua core fisik)
+            session_options = ort.SessionOptions()
+            session_options.intra_op_num_threads = num_threads
+            session_options.inter_op_num_threads = 1
+            model_kwargs["session_options"] = session_options
+        return SentenceTransformer(model_path, backend="onnx", model_kwargs=model_kwargs)
+    return SentenceTransformer(model_path)
+
+def export_quantized_onnx(model_path):
+    """Export the local model to ONNX and write an int8 dynamically quantized copy."""
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    if not (Path(model_path) / _onnx_file_name()).exists():
+        logging.info(f"Exporting {model_path} to quantized ONNX ({ONNX_QUANTIZATION}).")
+        onnx_model = SentenceTransformer(model_path, backend="onnx")
+        export_dynamic_quantized_onnx_model(onnx_model, ONNX_QUANTIZATION, model_path)
+    return Path(model_path) / _onnx_file_name()
+
+def validate_backend(reference, candidate, texts=None):
+    """Return the mean and minimum cosine similarity between two encoders on held-out texts."""
+    texts = texts or VALIDATION_TEXTS
+    ref = reference.encode(texts, show_progress_bar=False, normalize_embeddings=True)
+    cand = candidate.encode(texts, show_progress_bar=False, normalize_embeddings=True)
+    cosines = np.sum(ref * cand, axis=1)
+    return {
+        "mean_cosine": float(cosines.mean()),
+        "min_cosine": float(cosines.min()),
+        "num_texts": len(texts),
+    }
+
+def load_sentence_encoder(model_path, backend=None, validation_texts=None, num_threads=None):
+    """Load the encoder for the configured backend, falling back to torch if ONNX disagrees.
+
+    `num_threads` bounds the ONNX session's intra-op pool (torch is limited by the caller).
+    """
+    backend = backend or ENCODER_BACKEND
+    if backend != "onnx":
+        return _open_model(model_path, "torch"), "torch"
+
+    try:
+        onnx_path = export_quantized_onnx(model_path)
+        report_path = onnx_path.with_suffix(".validation.json")
+        candidate = _open_model(model_path, "onnx", num_threads)
+
+        if report_path.exists():
+            report = json.loads(report_path.read_text(encoding="utf-8"))
+        else:
+            report = validate_backend(_open_model(model_path, "torch"), candidate, validation_texts)
+            report_path.write_text(json.dumps(report, indent=2))
+        logging.info(f"ONNX validation: mean cosine {report['mean_cosine']:.4f}, min {report['min_cosine']:.4f}")
+
+        # Bandingkan dengan threshold yang berlaku sekarang, bukan saat laporan ditulis
+        if report["min_cosine"] >= ONNX_MIN_COSINE:
+            return candidate, "onnx"
+        logging.warning(f"Quantized ONNX below cosine threshold {ONNX_MIN_COSINE}, using torch backend.")
+    except Exception as e:
+        logging.warning(f"ONNX backend unavailable, using torch backend: {e}")
+    return _open_model(model_path, "torch"), "torch"
+
+def _init_worker(model_path, backend, num_threads):
+    global _worker_model
+    import torch
+
+    torch.set_num_threads(num_threads)
+    _worker_model = _open_model(model_path, backend, num_threads)
+
+def _encode_batches(texts_per_batch, model=None):
+    model = model or _worker_model
+    return [
+        model.encode(texts, batch_size=len(texts), show_progress_bar=False, normalize_embeddings=True)
+        for texts in texts_per_batch
+    ]
+
+class EncoderPool:
+    """Spawned encoder worker processes that stay alive across `encode_texts` calls.
+
+    Each worker loads the model once; reuse one pool for all batches of a run instead of
+    paying the spawn and model load for every call.
+    """
+
+    def __init__(self, model, model_path, workers=None):
+        import torch
+
+        self.workers = workers or ENCODE_WORKERS
+        # Bagi budget thread proses induk ke tiap worker
+        num_threads = max(1, torch.get_num_threads() // self.workers)
+        backend = getattr(model, "backend", "torch")
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=mp.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_path, backend, num_threads)
+        )
+
+    def encode(self, texts_per_batch):
+        # Bagi batch secara round-robin agar beban tiap worker seimbang
+        shards = [texts_per_batch[w::self.workers] for w in range(self.workers)]
+        vectors_per_batch = [None] * len(texts_per_batch)
+        for w, result in enumerate(self.executor.map(_encode_batches, shards)):
+            vectors_per_batch[w::self.workers] = result
+        return vectors_per_batch
+
+    def close(self):
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def open_encoder_pool(model, model_path, workers=None):
+    """Return a persistent EncoderPool, or None when encoding runs in-process."""
+    workers = workers or ENCODE_WORKERS
+    if workers <= 1 or not model_path:
+        return None
+    return EncoderPool(model, model_path, workers)
+
+def encode_texts(texts, model, model_path=None, workers=None, pool=None):
+    """Encode texts with length bucketing, optional process fan-out and chunk pooling.
+
+    Long texts are split into chunks whose vectors are mean-pooled (weighted by chunk
+    length). Embeddings are L2-normalized and returned in the original order. Pass a
+    `pool` from `open_encoder_pool` to reuse worker processes across calls.
+    """
+    workers = workers or ENCODE_WORKERS
+    if not texts:
+        return np.zeros((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+
+    chunks, owners, weights = [], [], []
+    for owner, text in enumerate(texts):
+        for chunk in chunk_text(text):
+            chunks.append(chunk)
+            owners.append(owner)
+            weights.append(max(1, len(chunk.split())))
+    weights = np.asarray(weights, dtype=np.float32)
+
+    batches = length_buckets(weights)
+    texts_per_batch = [[chunks[i] for i in batch] for batch in batches]
+    logging.info(f"Encoding {len(texts)} texts as {len(chunks)} chunks in {len(batches)} length-bucketed batches.")
+
+    if pool is not None and len(batches) > 1:
+        vectors_per_batch = pool.encode(texts_per_batch)
+    elif pool is None and workers > 1 and model_path and len(batches) > 1:
+        with EncoderPool(model, model_path, workers) as pool:
+            vectors_per_batch = pool.encode(texts_per_batch)
+    else:
+        vectors_per_batch = _encode_batches(texts_per_batch, model=model)
+
+    chunk_vectors = np.empty((len(chunks), vectors_per_batch[0].shape[1]), dtype=np.float32)
+    for batch, vectors in zip(batches, vectors_per_batch):
+        chunk_vectors[batch] = vectors
+
+    if len(chunks) == len(texts):
+        return chunk_vectors
+
+    embeddings = np.zeros((len(texts), chunk_vectors.shape[1]), dtype=np.float32)
+    np.add.at(embeddings, np.asarray(owners), chunk_vectors * weights[:, None])
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.maximum(norms, 1e-12)
@@ -0,0 +1,137 @@
+import os
+import time
+import random
+import asyncio
+from html import escape
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse, PlainTextResponse
+
+app = FastAPI()
+
+# === konfigurasi (via environment) ===
+MOCK_NUM_ITEMS = int(os.environ.get("MOCK_NUM_ITEMS", 1000))
+MOCK_LATENCY_MS = float(os.environ.get("MOCK_LATENCY_MS", 50))
+MOCK_LATENCY_JITTER_MS = float(os.environ.get("MOCK_LATENCY_JITTER_MS", 25))
+MOCK_ERROR_RATE = float(os.environ.get("MOCK_ERROR_RATE", 0.0))
+MOCK_RATE_LIMIT = float(os.environ.get("MOCK_RATE_LIMIT", 0))  # request/detik, 0 = tanpa batas
+MOCK_SEED = int(os.environ.get("MOCK_SEED", 42))
+
+HANDLE_PREFIX = "1721.1"
+FIRST_HANDLE = 100000
+RPP_OPTIONS = [5, 10, 20, 40, 60, 80, 100]
+
+WORDS = [
+    "learning", "neural", "quantum", "graph", "energy", "climate", "protein", "network",
+    "optimization", "robotic", "material", "policy", "market", "urban", "signal", "imaging",
+    "language", "model", "control", "dynamics", "design", "system", "analysis", "data",
+]
+FIRST_NAMES = ["Alice", "Bob", "Carol", "David", "Erin", "Frank", "Grace", "Heidi"]
+LAST_NAMES = ["Smith", "Nguyen", "Garcia", "Kim", "Müller", "Rossi", "Tanaka", "Okafor"]
+JOURNALS = ["Nature", "Science", "Physical Review Letters", "Journal of Machine Learning Research", "Cell"]
+PUBLISHERS = ["Springer", "Elsevier", "IEEE", "American Physical Society", "MIT Press"]
+
+class TokenBucket:
+    """Simple token bucket used to emulate DSpace rate limiting."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        # Kapasitas minimal 1 token agar rate < 1 request/detik tetap bisa dilayani
+        self.capacity = max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def allow(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+rate_limiter = TokenBucket(MOCK_RATE_LIMIT) if MOCK_RATE_LIMIT > 0 else None
+fault_rng = random.Random(MOCK_SEED)
+
+def synthetic_item(index):
+    """Generate deterministic metadata for the index-th item (newest first)."""
+    rng = random.Random(MOCK_SEED * 1_000_003 + index)
+    title_words = rng.sample(WORDS, rng.randint(3, 7))
+    return {
+        "handle": f"{HANDLE_PREFIX}/{FIRST_HANDLE + index}",
+        "title": " ".join(title_words).capitalize(),
+        "abstract": " ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 200))).capitalize() + ".",
+        "authors": [
+            f"{rng.choice(LAST_NAMES)}, {rng.choice(FIRST_NAMES)}" for _ in range(rng.randint(1, 5))
+        ],
+        "journal": rng.choice(JOURNALS),
+        "publisher": rng.choice(PUBLISHERS),
+        "date": f"{2025 - index * 10 // max(1, MOCK_NUM_ITEMS)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+    }
+
+def render_discover(page, rpp):
+    """Render a /discover listing page with the selectors used by the scraper."""
+    start = (page - 1) * rpp
+    indices = range(start, min(start + rpp, MOCK_NUM_ITEMS))
+    items = "\n".join(
+        f'<div class="ds-artifact-item"><a href="/handle/{synthetic_item(i)["handle"]}">'
+        f'{escape(synthetic_item(i)["title"])}</a></div>'
+        for i in indices
+    )
+    options = "\n".join(
+        f'<li><a href="/discover?page=1&rpp={n}&sort_by=dc.date.issued_dt&order=desc">{n}</a></li>'
+        for n in RPP_OPTIONS
+    )
+    next_link = ""
+    if start + rpp < MOCK_NUM_ITEMS:
+        next_link = (
+            f'<a class="next-page-link" href="/discover?page={page + 1}&rpp={rpp}'
+            f'&sort_by=dc.date.issued_dt&order=desc">Next</a>'
+        )
+    return f"""<html><body>
+<button class="dropdown-toggle">Options</button>
+<ul class="dropdown-menu">
+<li><a href="/discover?page=1&rpp={rpp}&sort_by=dc.date.issued_dt&order=desc">Issue Date Most Recent</a></li>
+{options}
+</ul>
+<div id="results">
+{items}
+</div>
+{next_link}
+</body></html>"""
+
+def render_item(item):
+    """Render a /handle/... item page matching the scraper's extraction schema."""
+    authors = "; ".join(escape(a) for a in item["authors"])
+    return f"""<html><body>
+<div class="item-summary-view-metadata">
+<h2 class="page-header">{escape(item["title"])}</h2>
+<div class="simple-item-view-authors"><h5>Author(s)</h5>{authors}</div>
+<div class="simple-item-view-description"><h5>Abstract</h5><div>{escape(item["abstract"])}</div></div>
+<div class="simple-item-view-journal"><h5>Journal</h5><div>{escape(item["journal"])}</div></div>
+<div class="simple-item-view-journal"><h5>Publisher</h5><div>{escape(item["publisher"])}</div></div>
+<div class="simple-item-view-date"><h5>Date issued</h5>{item["date"]}</div>
+<div class="simple-item-view-uri"><h5>URI</h5><a href="/handle/{item["handle"]}">/handle/{item["handle"]}</a></div>
+</div>
+</body></html>"""
+
+@app.middleware("http")
+async def inject_faults(request: Request, call_next):
+    """Apply configured latency, rate limiting and random server errors."""
+    delay = max(0.0, fault_rng.gauss(MOCK_LATENCY_MS, MOCK_LATENCY_JITTER_MS)) / 1000
+    await asyncio.sleep(delay)
+    if rate_limiter and not rate_limiter.allow():
+        return PlainTextResponse("Too Many Requests", status_code=429, headers={"Retry-After": "1"})
+    if fault_rng.random() < MOCK_ERROR_RATE:
+        return PlainTextResponse("Internal Server Error", status_code=500)
+    return await call_next(request)
+
+@app.get("/discover", response_class=HTMLResponse)
+def discover(page: int = 1, rpp: int = 10, sort_by: str = "", order: str = ""):
+    return render_discover(max(1, page), max(1, rpp))
+
+@app.get("/handle/{prefix}/{suffix}", response_class=HTMLResponse)
+def handle(prefix: str, suffix: int):
+    index = suffix - FIRST_HANDLE
+    if prefix != HANDLE_PREFIX or not 0 <= index < MOCK_NUM_ITEMS:
+        return HTMLResponse("Not Found", status_code=404)
+    return render_item(synthetic_item(index))
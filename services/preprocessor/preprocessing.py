@@ -3,9 +3,12 @@ import re
 import sys
 import json
 import logging
+import unicodedata
 import numpy as np
+from functools import lru_cache
 from pathlib import Path
 from prometheus_client import Counter, Summary
+from encoder import encode_texts, load_sentence_encoder
 
 # Base path dalam container
 BASE_PATH = Path("app")
@@ -34,55 +37,121 @@ preprocessed_papers_total = Counter(
     "preprocessed_papers_total", "Total number of papers preprocessed"
 )
 
-def clean_text(text):
-    """ Cleans text by removing special characters, numbers, and stopwords, and applying lemmatization. """
-    from nltk.tokenize import word_tokenize
+# Pipeline per field: "full" (NLP lengkap), "light" (normalisasi ringan), "passthrough"
+FIELD_PIPELINES = {
+    "title": "full",
+    "abstract": "full",
+    "authors": "light",
+    "journal_conference_name": "light",
+    "publisher": "light",
+    "group_name": "light",
+    "doi": "passthrough",
+    "year": "passthrough",
+}
+DEFAULT_PIPELINE = "full"
+
+DIGITS_RE = re.compile(r"\d+")
+SPACES_RE = re.compile(r"\s+")
+PUNCT_RE = re.compile(r"[^\w\s]")
+
+@lru_cache(maxsize=1)
+def _nltk_resources():
+    """Download (once) and load the NLTK stopwords and lemmatizer."""
     from nltk.corpus import stopwords
     from nltk.stem import WordNetLemmatizer
     import nltk
 
+    # Ensure necessary NLTK resources are downloaded
+    nltk.download("punkt_tab", quiet=True)
+    nltk.download("stopwords", quiet=True)
+    nltk.download("wordnet", quiet=True)
+    return set(stopwords.words("english")), WordNetLemmatizer()
+
+def clean_texts(texts):
+    """ Full NLP cleaning of a batch: lowercase, drop numbers/punctuation/stopwords, lemmatize. """
+    from nltk.tokenize import word_tokenize
+
     try:
-        # Ensure necessary NLTK resources are downloaded
-        nltk.download("punkt_tab", quiet=True)
-        nltk.download("stopwords", quiet=True)
-        nltk.download("wordnet", quiet=True)
-
-        stopwords_en = set(stopwords.words("english"))
-        lemmatizer = WordNetLemmatizer()
-
-        text = text.lower().strip()
-        text = re.sub(r"\d+", "", text)
-        text = re.sub(r"\s+", " ", text)
-        text = re.sub(r"[^\w\s]", "", text)
-        tokens = word_tokenize(text)
-        tokens = [lemmatizer.lemmatize(word) for word in tokens if word not in stopwords_en]
-        return " ".join(tokens)
+        stopwords_en, lemmatizer = _nltk_resources()
     except Exception as e:
-        logging.error(f"Error in clean_text: {e}")
-        return ""
+        logging.error(f"Error loading NLTK resources: {e}")
+        return [""] * len(texts)
+
+    lemmas = {}
+    cleaned = []
+    for text in texts:
+        # Kegagalan satu teks hanya mengosongkan teks itu, bukan seluruh batch
+        try:
+            text = text.lower().strip()
+            text = DIGITS_RE.sub("", text)
+            text = SPACES_RE.sub(" ", text)
+            text = PUNCT_RE.sub("", text)
+            tokens = []
+            for word in word_tokenize(text):
+                if word in stopwords_en:
+                    continue
+                # Cache lemma per kata, kosakata jauh lebih kecil dari jumlah token
+                if word not in lemmas:
+                    lemmas[word] = lemmatizer.lemmatize(word)
+                tokens.append(lemmas[word])
+            cleaned.append(" ".join(tokens))
+        except Exception as e:
+            logging.error(f"Error in clean_texts: {e}")
+            cleaned.append("")
+    return cleaned
+
+def clean_text(text):
+    """ Cleans text by removing special characters, numbers, and stopwords, and applying lemmatization. """
+    return clean_texts([text])[0]
+
+def normalize_texts(texts):
+    """ Light normalization for names and venues: unicode NFKC, lowercase, no punctuation. """
+    return [
+        SPACES_RE.sub(" ", PUNCT_RE.sub(" ", unicodedata.normalize("NFKC", text).lower())).strip()
+        for text in texts
+    ]
+
+PIPELINES = {
+    "full": clean_texts,
+    "light": normalize_texts,
+    "passthrough": lambda texts: [text.strip() for text in texts],
+}
 
 @preprocessing_duration_seconds.time()
-def preprocess_papers(papers, output_path=PREPROCESSED_DATA_PATH):
-    """Cleans all text fields in the dataset, including list-of-strings fields like authors."""
-    seen = set()
-    cleaned_papers = []
+def preprocess_papers(papers, output_path=PREPROCESSED_DATA_PATH, field_pipelines=None):
+    """Cleans every text field with its configured pipeline, batching fields that share a pipeline.
 
-    for paper in papers:
-        cleaned_paper = {}
+    List-of-strings fields like authors are joined before cleaning.
+    """
+    field_pipelines = {**FIELD_PIPELINES, **(field_pipelines or {})}
+
+    # Kumpulkan semua nilai teks per pipeline agar dibersihkan dalam satu batch
+    cleaned_papers = [dict(paper) for paper in papers]
+    batches = {}
+    for idx, paper in enumerate(papers):
         for key, value in paper.items():
+            if isinstance(value, list) and all(isinstance(item, str) for item in value):
+                value = " ".join(value)
             if isinstance(value, str):
-                cleaned_paper[key] = clean_text(value)
-            elif isinstance(value, list) and all(isinstance(item, str) for item in value):
-                combined = " ".join(value)
-                cleaned_paper[key] = clean_text(combined)
-            else:
-                cleaned_paper[key] = value
+                pipeline = field_pipelines.get(key, DEFAULT_PIPELINE)
+                batch = batches.setdefault(pipeline, ([], []))
+                batch[0].append((idx, key))
+                batch[1].append(value)
+
+    for pipeline, (targets, values) in batches.items():
+        for (idx, key), cleaned in zip(targets, PIPELINES[pipeline](values)):
+            cleaned_papers[idx][key] = cleaned
+        logging.info(f"Pipeline '{pipeline}': {len(values)} values cleaned.")
 
+    seen = set()
+    unique_papers = []
+    for cleaned_paper in cleaned_papers:
         # Buat kunci unik dari nilai-nilainya
         paper_key = tuple(tuple(v) if isinstance(v, list) else v for v in cleaned_paper.values())
         if paper_key not in seen:
             seen.add(paper_key)
-            cleaned_papers.append(cleaned_paper)
+            unique_papers.append(cleaned_paper)
+    cleaned_papers = unique_papers
 
     try:
         with open(output_path, "w", encoding="utf-8") as f:
@@ -101,12 +170,11 @@ def compute_embeddings(texts, save_path=EMBEDDING_PATH):
 
     logging.info("Computing embeddings using SentenceTransformer.")
     try:
-        if os.path.exists(MODEL_LOCAL_PATH):
-            model = SentenceTransformer(MODEL_LOCAL_PATH)
-        else:
-            model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
-            model.save(MODEL_LOCAL_PATH)
-        embeddings = model.encode(texts, batch_size=32, show_progress_bar=True, normalize_embeddings=True)
+        if not os.path.exists(MODEL_LOCAL_PATH):
+            SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2').save(MODEL_LOCAL_PATH)
+        model, backend = load_sentence_encoder(MODEL_LOCAL_PATH, validation_texts=texts[:64])
+        logging.info(f"Sentence encoder backend: {backend}")
+        embeddings = encode_texts(texts, model, model_path=MODEL_LOCAL_PATH)
         np.save(save_path, embeddings)
         logging.info(f"Embeddings saved at {save_path}")
         return embeddings
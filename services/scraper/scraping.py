@@ -17,6 +17,10 @@ BASE_PATH = Path("app")
 RAW_DATA_PATH = BASE_PATH.parent / "data" / "raw"
 RAW_DATA_PATH.mkdir(parents=True, exist_ok=True)
 
+# Target DSpace (bisa diarahkan ke mock lokal) dan skala delay anti rate-limit
+DSPACE_BASE_URL = os.environ.get("DSPACE_BASE_URL", "https://dspace.mit.edu").rstrip("/")
+SCRAPER_DELAY_SCALE = float(os.environ.get("SCRAPER_DELAY_SCALE", 1.0))
+
 #Logging configuration
 logging.basicConfig(
     level=logging.INFO,  # Tampilkan level INFO dan di atasnya
@@ -58,7 +62,7 @@ async def scraping_data(title_per_page=10, max_pages=3):
             context = await browser.new_context(user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36")
             page = await context.new_page()
 
-            await page.goto("https://dspace.mit.edu/discover", wait_until="domcontentloaded")
+            await page.goto(f"{DSPACE_BASE_URL}/discover", wait_until="domcontentloaded")
             print(f"Page loaded: {time.time() - start:.2f} seconds")
 
             # Sort by date desc
@@ -67,7 +71,7 @@ async def scraping_data(title_per_page=10, max_pages=3):
                 await page.wait_for_timeout(1000)
                 await page.click('a[href*="sort_by=dc.date.issued_dt"][href*="order=desc"]')
                 await page.wait_for_load_state("networkidle")
-                await page.wait_for_timeout(8000)
+                await page.wait_for_timeout(8000 * SCRAPER_DELAY_SCALE)
             except Exception as e:
                 print(f"Sort error: {e}")
 
@@ -77,14 +81,14 @@ async def scraping_data(title_per_page=10, max_pages=3):
                 await page.wait_for_timeout(1000)
                 await page.click(f'a[href*="rpp={title_per_page}"]')
                 await page.wait_for_load_state("networkidle")
-                await page.wait_for_timeout(8000)
+                await page.wait_for_timeout(8000 * SCRAPER_DELAY_SCALE)
             except Exception as e:
                 print(f"RPP error: {e}")
 
             for current_page in range(1, max_pages + 1):
                 try:
                     # Delay acak antar halaman (2.5 – 6.5 detik)
-                    delay = random.uniform(2.5, 6.5)
+                    delay = random.uniform(2.5, 6.5) * SCRAPER_DELAY_SCALE
                     print(f"[Page {current_page}] Sleeping for {delay:.2f} seconds...")
                     await page.wait_for_timeout(delay * 1000)
 
@@ -93,7 +97,7 @@ async def scraping_data(title_per_page=10, max_pages=3):
                     for a in items:
                         href = await a.get_attribute('href')
                         if href and "/handle/" in href:
-                            full_link = "https://dspace.mit.edu" + href
+                            full_link = DSPACE_BASE_URL + href
                             if full_link not in collected_links:
                                 collected_links.append(full_link)
 
@@ -123,7 +127,7 @@ async def scraping_data(title_per_page=10, max_pages=3):
                         break
 
                     # Delay kecil setelah klik next
-                    await page.wait_for_timeout(3000)
+                    await page.wait_for_timeout(3000 * SCRAPER_DELAY_SCALE)
 
                 except Exception as e:
                     print(f"Gagal klik next (page {current_page}): {e}")
@@ -145,7 +149,7 @@ async def scraping_data(title_per_page=10, max_pages=3):
             for idx, url in enumerate(collected_links):
                 try:
                     # Tambahkan delay acak antara 2.5–5 detik
-                    delay = random.uniform(2.5, 5.0)
+                    delay = random.uniform(2.5, 5.0) * SCRAPER_DELAY_SCALE
                     logging.info(f"Sleeping for {delay:.2f} seconds to avoid rate-limiting...")
                     await asyncio.sleep(delay)
 
@@ -178,7 +182,7 @@ async def scraping_data(title_per_page=10, max_pages=3):
                                 paper["year"] = match.group(0)
 
                         if paper.get("doi") and paper["doi"].startswith("/handle/"):
-                            paper["doi"] = "https://dspace.mit.edu" + paper["doi"]
+                            paper["doi"] = DSPACE_BASE_URL + paper["doi"]
 
                         cleaned_paper = {
                             "title": paper.get("title", ""),
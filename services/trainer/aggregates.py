@@ -0,0 +1,82 @@
+import json
+import logging
+import numpy as np
+import pandas as pd
+
+# Dimensi agregasi -> field metadata hasil scraping
+AGGREGATE_DIMENSIONS = {
+    "year": "year",
+    "venue": "journal_conference_name",
+    "publisher": "publisher",
+}
+
+# Placeholder scraper untuk metadata kosong (mentah dan setelah normalisasi preprocessor)
+MISSING_VALUES = {
+    "venue": ["", "No Journal/Conference", "no journal conference"],
+    "publisher": ["", "No Publisher", "no publisher"],
+}
+
+def compute_topic_aggregates(papers, topics):
+    """Count documents per topic over years, venues and publishers with a vectorized group-by."""
+    df = pd.DataFrame(papers, columns=list(AGGREGATE_DIMENSIONS.values()))
+    df.columns = list(AGGREGATE_DIMENSIONS)
+    df["topic"] = np.asarray(topics, dtype=np.int64)
+    df["year"] = pd.to_numeric(df["year"], errors="coerce").astype("Int64")
+    for dim, missing in MISSING_VALUES.items():
+        df[dim] = df[dim].replace(missing, pd.NA)
+
+    aggregates = {}
+    for dim in AGGREGATE_DIMENSIONS:
+        counts = (
+            df.dropna(subset=[dim])
+            .groupby([dim, "topic"], sort=True)
+            .size()
+            .rename("count")
+            .reset_index()
+        )
+        # Proporsi topik dalam tiap tahun/venue/publisher
+        counts["share"] = counts["count"] / counts.groupby(dim)["count"].transform("sum")
+        aggregates[dim] = counts
+    logging.info(
+        "Topic aggregates computed: "
+        + ", ".join(f"{dim}={len(counts)} rows" for dim, counts in aggregates.items())
+    )
+    return aggregates
+
+def save_topic_aggregates(aggregates, path):
+    """Save the aggregates of a run as JSON records per dimension."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({dim: json.loads(df.to_json(orient="records")) for dim, df in aggregates.items()}, f)
+    logging.info(f"Topic aggregates saved to {path}")
+
+def load_topic_aggregates(path):
+    """Load saved aggregates back into one DataFrame per dimension."""
+    saved = json.loads(path.read_text(encoding="utf-8"))
+    aggregates = {}
+    for dim, records in saved.items():
+        df = pd.DataFrame.from_records(records, columns=[dim, "topic", "count", "share"])
+        if dim == "year":
+            df["year"] = df["year"].astype("Int64")
+        aggregates[dim] = df
+    return aggregates
+
+def query_topic_aggregates(aggregates, by, topics=None, keys=None, year_from=None, year_to=None, limit=None):
+    """Filter the aggregates of one dimension by topic, key and (for years) a year range."""
+    df = aggregates[by]
+    mask = np.ones(len(df), dtype=bool)
+    if topics:
+        mask &= df["topic"].isin(topics).to_numpy()
+    if keys:
+        mask &= df[by].astype(str).isin([str(k) for k in keys]).to_numpy()
+    if by == "year" and year_from is not None:
+        mask &= (df["year"] >= year_from).to_numpy(dtype=bool, na_value=False)
+    if by == "year" and year_to is not None:
+        mask &= (df["year"] <= year_to).to_numpy(dtype=bool, na_value=False)
+
+    result = df[mask]
+    if by != "year":
+        # Venue/publisher: urutkan dari yang paling banyak dokumennya
+        result = result.sort_values("count", ascending=False, kind="stable")
+    if limit:
+        result = result.head(limit)
+    return result
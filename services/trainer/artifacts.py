@@ -0,0 +1,43 @@
+import json
+import struct
+import numpy as np
+
+# Kode dtype safetensors -> dtype numpy
+SAFETENSORS_DTYPES = {
+    "F64": np.float64,
+    "F32": np.float32,
+    "F16": np.float16,
+    "I64": np.int64,
+    "I32": np.int32,
+    "I16": np.int16,
+    "I8": np.int8,
+    "U8": np.uint8,
+    "BOOL": np.bool_,
+}
+
+def load_document_embeddings(path):
+    """Memory-map the document embeddings of a run instead of reading them into RAM."""
+    return np.load(path, mmap_mode="r")
+
+def load_safetensors_mmap(path):
+    """Memory-map every tensor of a safetensors file as a read-only numpy array.
+
+    The file is an 8-byte little-endian header length, a JSON header with dtype, shape
+    and data offsets per tensor, then the raw little-endian data.
+    """
+    with open(path, "rb") as f:
+        (header_size,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_size))
+    header.pop("__metadata__", None)
+
+    arrays = {}
+    for name, info in header.items():
+        start, end = info["data_offsets"]
+        dtype = np.dtype(SAFETENSORS_DTYPES[info["dtype"]]).newbyteorder("<")
+        if start == end:
+            arrays[name] = np.zeros(info["shape"], dtype=dtype)
+            continue
+        arrays[name] = np.memmap(
+            path, dtype=dtype, mode="r", offset=8 + header_size + start, shape=tuple(info["shape"])
+        )
+    return arrays
@@ -4,12 +4,17 @@ import json
 import random
 import logging
 import shutil
+# Diimpor sebelum numpy/torch agar batas thread BLAS/OpenMP/numba berlaku
+from resources import thread_budget, effective_settings, STAGE_BUDGETS
 import numpy as np
 from pathlib import Path
+from contextlib import nullcontext
 from datetime import datetime
 from gensim.models.coherencemodel import CoherenceModel
 from gensim.corpora.dictionary import Dictionary
 from prometheus_client import Summary, Gauge
+from encoder import encode_texts, load_sentence_encoder, open_encoder_pool
+from aggregates import compute_topic_aggregates, save_topic_aggregates
 
 # Base path dalam container
 BASE_PATH = Path("app")
@@ -30,26 +35,44 @@ num_topics_metric = Gauge(
     'bertopic_num_topics', 
     'Number of topics discovered by the BERTopic model'
 )
+artifact_size_metric = Gauge(
+    'bertopic_artifact_size_bytes',
+    'Size on disk of the saved BERTopic model artifact'
+)
+predicted_documents_metric = Gauge(
+    'bertopic_predicted_documents',
+    'Number of documents assigned by approximate prediction in large-corpus mode'
+)
 
 # Paths (relatif terhadap /app)
 PAPERS_DATA_PATH = BASE_PATH.parent / "data" / "processed" / "data_preprocessed.json"
 MODEL_LOCAL_PATH = str(BASE_PATH.parent / "runs" / "local_models" / "all-MiniLM-L6-v2")
+EMBEDDING_MODEL_ID = "sentence-transformers/all-MiniLM-L6-v2"
 SYMLINK_PATH = BASE_PATH.parent / "runs" / "topic_model"
 RUN_DIR = BASE_PATH.parent / "runs" / run_id
 MODEL_PATH = RUN_DIR / "bertopic_model"
 EMBEDDING_PATH = RUN_DIR / "embeddings.npy"
 TOPICS_PATH = RUN_DIR / "topics.json"
+DOCUMENTS_PATH = RUN_DIR / "documents.json"
+AGGREGATES_PATH = RUN_DIR / "topic_aggregates.json"
 
-# Hapus jika sudah ada
-if SYMLINK_PATH.exists() or SYMLINK_PATH.is_symlink():
-    if SYMLINK_PATH.is_symlink() or SYMLINK_PATH.is_file():
-        SYMLINK_PATH.unlink()
-    else:
-        shutil.rmtree(SYMLINK_PATH)
+# Field yang digabung menjadi dokumen, contoh: "title,abstract"
+TEXT_FIELDS = [f.strip() for f in os.environ.get("TEXT_FIELDS", "title").split(",") if f.strip()]
+
+# Mode korpus besar: fit UMAP/HDBSCAN pada sampel, sisanya diprediksi per batch
+LARGE_CORPUS_THRESHOLD = int(os.environ.get("LARGE_CORPUS_THRESHOLD", 200_000))
+LARGE_CORPUS_SAMPLE_SIZE = int(os.environ.get("LARGE_CORPUS_SAMPLE_SIZE", 50_000))
+LARGE_CORPUS_BATCH_SIZE = int(os.environ.get("LARGE_CORPUS_BATCH_SIZE", 10_000))
+LARGE_CORPUS_STRATIFY_KEY = os.environ.get("LARGE_CORPUS_STRATIFY_KEY", "year")
 
-# Ensure directories exist
-for p in [PAPERS_DATA_PATH.parent, Path(MODEL_LOCAL_PATH).parent, Path(RUN_DIR), Path(MODEL_PATH).parent, TOPICS_PATH.parent]:
-    os.makedirs(p, exist_ok=True)
+def prepare_run_dirs():
+    """Ensure the data and run directories exist.
+
+    Dipanggil saat training, bukan saat import, karena worker encoding (spawn)
+    mengimpor ulang modul ini.
+    """
+    for p in [PAPERS_DATA_PATH.parent, Path(MODEL_LOCAL_PATH).parent, Path(RUN_DIR), Path(MODEL_PATH).parent, TOPICS_PATH.parent]:
+        os.makedirs(p, exist_ok=True)
 
 #Logging configuration
 logging.basicConfig(
@@ -63,49 +86,234 @@ SEED = 42
 random.seed(SEED)
 np.random.seed(SEED)
 
-@training_duration.time()
-def compute_topics_with_bertopic(papers, save_model=True):
-    """Train BERTopic using HDBSCAN and c-TFIDF."""
+def load_embedding_model(validation_texts=None):
+    """Load the local sentence encoder (torch or quantized ONNX), downloading it on first use."""
     from sentence_transformers import SentenceTransformer
-    from bertopic import BERTopic
-    from umap import UMAP
-    from hdbscan import HDBSCAN
 
-    texts = [paper["title"] for paper in papers]
-    logging.info("Computing embeddings using SentenceTransformer.")
+    if not os.path.exists(MODEL_LOCAL_PATH):
+        SentenceTransformer(EMBEDDING_MODEL_ID).save(MODEL_LOCAL_PATH)
+    model, backend = load_sentence_encoder(
+        MODEL_LOCAL_PATH, validation_texts=validation_texts, num_threads=STAGE_BUDGETS["encode"]
+    )
+    logging.info(f"Sentence encoder backend: {backend}")
+    return model
 
-    if os.path.exists(MODEL_LOCAL_PATH):
-        model = SentenceTransformer(MODEL_LOCAL_PATH)
-    else:
-        model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
-        model.save(MODEL_LOCAL_PATH)
+def save_topic_model(topic_model, path=MODEL_PATH):
+    """Save a lean artifact: JSON metadata + safetensors, embedding model referenced by id."""
+    topic_model.save(
+        str(path),
+        serialization="safetensors",
+        save_ctfidf=True,
+        save_embedding_model=EMBEDDING_MODEL_ID
+    )
+    size = sum(f.stat().st_size for f in Path(path).rglob("*") if f.is_file())
+    artifact_size_metric.set(size)
+    logging.info(f"Model saved at {path} ({size / 1024:.1f} KiB)")
+    return size
 
-    embeddings = model.encode(texts, batch_size=32, show_progress_bar=True, normalize_embeddings=True)
-    np.save(EMBEDDING_PATH, embeddings)
-    logging.info(f"Embeddings saved at {EMBEDDING_PATH}")
+def build_texts(papers, fields=None):
+    """Join the configured text fields of each paper into one document."""
+    fields = fields or TEXT_FIELDS
+    return [". ".join(paper[f] for f in fields if paper.get(f)) for paper in papers]
+
+def tokenize_texts(papers, fields=None):
+    """Tokenize the configured text fields of each paper for coherence scoring.
+
+    Tiap field di-split terpisah agar pemisah ". " dari build_texts tidak menempel ke kata.
+    """
+    fields = fields or TEXT_FIELDS
+    return [[token for f in fields if paper.get(f) for token in paper[f].split()] for paper in papers]
+
+def embed_texts(texts, model, pool=None):
+    """Encode documents with the length-bucketed encoder, reusing `pool` workers if given."""
+    with thread_budget("encode"):
+        return encode_texts(texts, model, model_path=MODEL_LOCAL_PATH, pool=pool)
+
+def build_topic_model(embedding_model):
+    """Create an unfitted BERTopic with the project's UMAP/HDBSCAN settings."""
+    from bertopic import BERTopic
+    from umap import UMAP
+    from hdbscan import HDBSCAN
 
-    logging.info("Training BERTopic model...")
     umap_model = UMAP(
         n_neighbors=4, n_components=5, min_dist=0.093, metric="cosine", random_state=SEED
     )
     hdbscan_model = HDBSCAN(
-        min_cluster_size=5, metric="euclidean", cluster_selection_method="eom", prediction_data=True
+        min_cluster_size=5, metric="euclidean", cluster_selection_method="eom", prediction_data=True,
+        core_dist_n_jobs=STAGE_BUDGETS["fit"]
     )
 
-    topic_model = BERTopic(
+    return BERTopic(
         umap_model=umap_model,
         hdbscan_model=hdbscan_model,
         vectorizer_model=None,
-        embedding_model=model
+        embedding_model=embedding_model
+    )
+
+def stratified_sample_indices(papers, sample_size, key=LARGE_CORPUS_STRATIFY_KEY, seed=SEED):
+    """Pick a sample of paper indices proportional to the size of each `key` stratum."""
+    n = len(papers)
+    if sample_size >= n:
+        return np.arange(n)
+
+    strata = {}
+    for idx, paper in enumerate(papers):
+        strata.setdefault(paper.get(key) or "", []).append(idx)
+
+    rng = np.random.default_rng(seed)
+    selected = []
+    for members in strata.values():
+        # Alokasi proporsional, minimal satu dokumen per strata
+        quota = max(1, round(sample_size * len(members) / n))
+        quota = min(quota, len(members))
+        selected.append(rng.choice(members, size=quota, replace=False))
+
+    sample = np.concatenate(selected)
+    if len(sample) > sample_size:
+        sample = rng.choice(sample, size=sample_size, replace=False)
+    return np.sort(sample)
+
+def _empty_counts(num_rows, topic_model):
+    """Create an empty (topics x vocabulary) count matrix."""
+    from scipy.sparse import csr_matrix
+
+    vocab_size = len(topic_model.vectorizer_model.get_feature_names_out())
+    return csr_matrix((num_rows, vocab_size), dtype=np.float64)
+
+def _accumulate_topic_term_counts(counts, vectorizer, texts, topics):
+    """Add the term counts of a batch of documents to the per-topic count matrix."""
+    from scipy.sparse import csr_matrix
+
+    doc_term = vectorizer.transform(texts)
+    # Baris 0 dipakai untuk outlier (-1), topik k di baris k + 1
+    rows = np.asarray(topics, dtype=np.int64) + 1
+    indicator = csr_matrix(
+        (np.ones(len(rows)), (rows, np.arange(len(rows)))),
+        shape=(counts.shape[0], len(rows))
     )
-    topic_model.fit_transform(texts, embeddings)
+    return counts + indicator @ doc_term
+
+def _update_topic_representations(topic_model, counts, topics):
+    """Recompute c-TF-IDF and topic keywords from the accumulated per-topic counts."""
+    topic_sizes = {int(t): int(c) for t, c in zip(*np.unique(topics, return_counts=True))}
+    if -1 not in topic_sizes:
+        counts = counts[1:]
+    topic_ids = sorted(topic_sizes)
+
+    c_tf_idf = topic_model.ctfidf_model.fit(counts).transform(counts).tocsr()
+    words = topic_model.vectorizer_model.get_feature_names_out()
+
+    representations = {}
+    for row, topic in enumerate(topic_ids):
+        values = c_tf_idf.getrow(row)
+        order = np.argsort(values.data)[::-1][:topic_model.top_n_words]
+        representations[topic] = [(words[values.indices[i]], float(values.data[i])) for i in order]
+
+    topic_model.c_tf_idf_ = c_tf_idf
+    topic_model.topic_representations_ = representations
+    # topic_labels_ dan _outliers diturunkan BERTopic dari representasi dan ukuran topik
+    topic_model.topic_sizes_ = topic_sizes
+    topic_model.topics_ = topics.tolist()
+
+def fit_large_corpus(texts, papers, model, sample_size=None, batch_size=None):
+    """Fit BERTopic on a stratified sample and assign the remaining documents in batches."""
+    sample_size = sample_size or LARGE_CORPUS_SAMPLE_SIZE
+    batch_size = batch_size or LARGE_CORPUS_BATCH_SIZE
+    n = len(texts)
+    prepare_run_dirs()
+
+    sample_idx = stratified_sample_indices(papers, sample_size)
+    logging.info(f"Large-corpus mode: fitting on {len(sample_idx)} of {n} documents.")
+    sample_texts = [texts[i] for i in sample_idx]
+    # Worker encoder dibuat sekali per training run dan dipakai ulang untuk semua batch
+    with thread_budget("encode"):
+        pool = open_encoder_pool(model, MODEL_LOCAL_PATH)
+    with pool or nullcontext():
+        sample_embeddings = embed_texts(sample_texts, model, pool)
+
+        topic_model = build_topic_model(model)
+        with thread_budget("fit"):
+            sample_topics, _ = topic_model.fit_transform(sample_texts, sample_embeddings)
+
+        # Embedding seluruh korpus ditulis ke memmap agar tidak ditahan di RAM
+        embeddings = np.lib.format.open_memmap(
+            EMBEDDING_PATH, mode="w+", dtype=np.float32, shape=(n, sample_embeddings.shape[1])
+        )
+        embeddings[sample_idx] = sample_embeddings
+        topics = np.full(n, -1, dtype=np.int32)
+        topics[sample_idx] = sample_topics
+
+        num_rows = max(topic_model.get_topics()) + 2
+        counts = _accumulate_topic_term_counts(
+            _empty_counts(num_rows, topic_model), topic_model.vectorizer_model, sample_texts, sample_topics
+        )
+        del sample_embeddings, sample_texts
+
+        in_sample = np.zeros(n, dtype=bool)
+        in_sample[sample_idx] = True
+        remaining = np.flatnonzero(~in_sample)
+
+        for start in range(0, len(remaining), batch_size):
+            batch_idx = remaining[start:start + batch_size]
+            batch_texts = [texts[i] for i in batch_idx]
+            batch_embeddings = embed_texts(batch_texts, model, pool)
+            with thread_budget("predict"):
+                batch_topics, _ = topic_model.transform(batch_texts, batch_embeddings)
+
+            embeddings[batch_idx] = batch_embeddings
+            topics[batch_idx] = batch_topics
+            counts = _accumulate_topic_term_counts(counts, topic_model.vectorizer_model, batch_texts, batch_topics)
+            predicted_documents_metric.set(start + len(batch_idx))
+            logging.info(f"Assigned {start + len(batch_idx)}/{len(remaining)} remaining documents.")
+
+    embeddings.flush()
+    del embeddings
+    logging.info(f"Embeddings saved at {EMBEDDING_PATH}")
+
+    _update_topic_representations(topic_model, counts, topics)
+    return topic_model
+
+@training_duration.time()
+def compute_topics_with_bertopic(papers, save_model=True, large_corpus=None):
+    """Train BERTopic using HDBSCAN and c-TFIDF.
+
+    With `large_corpus` (default: automatically above LARGE_CORPUS_THRESHOLD documents),
+    UMAP and HDBSCAN are fitted on a stratified sample and the rest is assigned in batches.
+    """
+    prepare_run_dirs()
+    texts = build_texts(papers)
+    logging.info("Computing embeddings using SentenceTransformer.")
+    # Held-out set untuk validasi backend ONNX terhadap model referensi
+    rng = np.random.default_rng(SEED)
+    holdout = [texts[i] for i in rng.choice(len(texts), size=min(64, len(texts)), replace=False)]
+    model = load_embedding_model(validation_texts=holdout)
+
+    if large_corpus is None:
+        large_corpus = len(texts) > LARGE_CORPUS_THRESHOLD
+
+    if large_corpus:
+        logging.info("Training BERTopic model in large-corpus mode...")
+        topic_model = fit_large_corpus(texts, papers, model)
+    else:
+        embeddings = embed_texts(texts, model)
+        np.save(EMBEDDING_PATH, embeddings)
+        logging.info(f"Embeddings saved at {EMBEDDING_PATH}")
+
+        logging.info("Training BERTopic model...")
+        topic_model = build_topic_model(model)
+        with thread_budget("fit"):
+            topic_model.fit_transform(texts, embeddings)
+
     num_topics = len(topic_model.get_topic_info())
     num_topics_metric.set(num_topics)
     logging.info(f"Model trained. {num_topics} topics found.")
 
+    save_document_topics(papers, topic_model.topics_)
+    save_topic_aggregates(compute_topic_aggregates(papers, topic_model.topics_), AGGREGATES_PATH)
+
+    artifact_size = 0
     if save_model:
-        topic_model.save(MODEL_PATH)
-        logging.info(f"Model saved at {MODEL_PATH}")
+        artifact_size = save_topic_model(topic_model)
         create_symlink_to_model()
 
     # Save topics info
@@ -119,13 +327,33 @@ def compute_topics_with_bertopic(papers, save_model=True):
         import mlflow
         mlflow.set_experiment("bertopic_experiment")
         mlflow.log_metric("num_topics", num_topics)
+        mlflow.log_param("encoder_backend", getattr(model, "backend", "torch"))
+        mlflow.log_params(effective_settings())
         mlflow.log_artifact(str(TOPICS_PATH))
-        mlflow.log_artifact(MODEL_PATH)
+        if save_model:
+            mlflow.log_metric("artifact_size_bytes", artifact_size)
+            mlflow.log_artifacts(str(MODEL_PATH), artifact_path="bertopic_model")
     except Exception as e:
         logging.warning(f"MLflow logging skipped: {e}")
 
     return topic_model, [int(t) for t in topic_model.topics_]
 
+def save_document_topics(papers, topics, path=DOCUMENTS_PATH):
+    """Save the topic assignment of each document with the metadata used for browsing."""
+    documents = [
+        {
+            "id": idx,
+            "topic": int(topic),
+            "title": paper.get("title", ""),
+            "year": paper.get("year", ""),
+            "doi": paper.get("doi", ""),
+        }
+        for idx, (paper, topic) in enumerate(zip(papers, topics))
+    ]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(documents, f, ensure_ascii=False)
+    logging.info(f"Document topics saved to {path}")
+
 def compute_coherence_score(topic_model, tokenized_texts, top_n=3):
     """Compute coherence score using preprocessed tokenized texts."""
     dictionary = Dictionary(tokenized_texts)
@@ -141,9 +369,11 @@ def compute_coherence_score(topic_model, tokenized_texts, top_n=3):
         topics=topic_words,
         texts=tokenized_texts,
         dictionary=dictionary,
-        coherence='c_v'
+        coherence='c_v',
+        processes=STAGE_BUDGETS["coherence"]
     )
-    score = coherence_model.get_coherence()
+    with thread_budget("coherence"):
+        score = coherence_model.get_coherence()
     coherence_score_metric.set(score)
     logging.info(f"{len(topic_words)} topics found")
     logging.info(f"Coherence Score (c_v): {score:.4f}")
@@ -160,8 +390,11 @@ def compute_coherence_score(topic_model, tokenized_texts, top_n=3):
 def create_symlink_to_model():
     try:
         if MODEL_PATH.exists():
-            if SYMLINK_PATH.exists() or SYMLINK_PATH.is_symlink():
-                os.remove(SYMLINK_PATH)
+            # Hapus jika sudah ada (symlink lama, file, atau direktori)
+            if SYMLINK_PATH.is_symlink() or SYMLINK_PATH.is_file():
+                SYMLINK_PATH.unlink()
+            elif SYMLINK_PATH.exists():
+                shutil.rmtree(SYMLINK_PATH)
             os.symlink(MODEL_PATH.resolve(), SYMLINK_PATH)
             logging.info(f"Symlink created: {SYMLINK_PATH} -> {MODEL_PATH}")
         else:
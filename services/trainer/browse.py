@@ -0,0 +1,188 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+import numpy as np
+from pathlib import Path
+from prometheus_client import Summary
+from aggregates import load_topic_aggregates, query_topic_aggregates
+from artifacts import load_document_embeddings, load_safetensors_mmap
+
+# Interval minimum (detik) antar pengecekan versi model di balik symlink
+BROWSE_REFRESH_SECONDS = float(os.environ.get("BROWSE_REFRESH_SECONDS", 5))
+BROWSE_KEYWORDS = 10
+
+# File yang menentukan isi index; ditimpa di tempat jika training diulang dalam run yang sama
+INDEX_FILES = (
+    "topics.json", "topic_embeddings.safetensors",
+    "../documents.json", "../topic_aggregates.json", "../embeddings.npy",
+)
+
+index_build_duration = Summary('topic_index_build_seconds', 'Time spent loading a model version into the topic index')
+
+def model_version(model_link):
+    """Identify the model behind `model_link` by its path and the mtime/size of the indexed files."""
+    target = os.path.realpath(model_link)
+    if not os.path.isfile(os.path.join(target, "topics.json")):
+        return None
+    parts = [target]
+    for name in INDEX_FILES:
+        try:
+            stat = os.stat(os.path.join(target, name))
+            parts.append(f"{name}:{stat.st_mtime_ns}:{stat.st_size}")
+        except FileNotFoundError:
+            parts.append(f"{name}:-")
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()[:16]
+
+class TopicIndex:
+    """In-memory topic and document index of one model version, with pre-serialized views."""
+
+    def __init__(self, version, topics, keywords, docs_by_topic, aggregates=None,
+                 topic_embeddings=None, document_embeddings=None, topic_offset=0):
+        self.version = version
+        self.etag = f'"{version}"'
+        self.docs_by_topic = docs_by_topic
+        self.aggregates = aggregates or {}
+        # Array embedding di-memory-map; baris baru dibaca dari disk saat dipakai
+        self.topic_embeddings = topic_embeddings
+        self.document_embeddings = document_embeddings
+        self.topic_offset = topic_offset
+        self.topics_body = json.dumps({"version": version, "topics": topics}).encode("utf-8")
+        self.topic_bodies = {
+            topic["topic"]: json.dumps({
+                "version": version,
+                **topic,
+                "keywords": keywords[topic["topic"]],
+            }).encode("utf-8")
+            for topic in topics
+        }
+
+    @classmethod
+    @index_build_duration.time()
+    def build(cls, model_dir, version):
+        """Build the index from a saved model directory and the run's documents.json."""
+        model_dir = Path(model_dir)
+        saved = json.loads((model_dir / "topics.json").read_text(encoding="utf-8"))
+        sizes = {int(t): n for t, n in saved["topic_sizes"].items()}
+        labels = {int(t): label for t, label in saved["topic_labels"].items()}
+        representations = {int(t): words for t, words in saved["topic_representations"].items()}
+
+        keywords = {
+            t: [{"word": word, "score": score} for word, score in words]
+            for t, words in representations.items()
+        }
+        topics = [
+            {
+                "topic": t,
+                "name": labels.get(t, str(t)),
+                "count": sizes.get(t, 0),
+                "keywords": [word for word, _ in representations[t][:BROWSE_KEYWORDS]],
+            }
+            for t in sorted(representations)
+        ]
+
+        docs_by_topic = {}
+        num_documents = 0
+        documents_path = model_dir.parent / "documents.json"
+        if documents_path.exists():
+            for doc in json.loads(documents_path.read_text(encoding="utf-8")):
+                docs_by_topic.setdefault(doc["topic"], []).append(doc)
+                num_documents += 1
+        else:
+            logging.warning(f"No documents found at {documents_path}, topic pages will be empty.")
+
+        topic_embeddings = None
+        topic_embeddings_path = model_dir / "topic_embeddings.safetensors"
+        if topic_embeddings_path.exists():
+            topic_embeddings = load_safetensors_mmap(topic_embeddings_path).get("topic_embeddings")
+
+        document_embeddings = None
+        embeddings_path = model_dir.parent / "embeddings.npy"
+        if embeddings_path.exists():
+            document_embeddings = load_document_embeddings(embeddings_path)
+            if len(document_embeddings) != num_documents:
+                logging.warning(
+                    f"{embeddings_path} has {len(document_embeddings)} rows for {num_documents} documents, ignoring it."
+                )
+                document_embeddings = None
+
+        aggregates = None
+        aggregates_path = model_dir.parent / "topic_aggregates.json"
+        if aggregates_path.exists():
+            aggregates = load_topic_aggregates(aggregates_path)
+
+        logging.info(f"Topic index built for model version {version}: {len(topics)} topics.")
+        return cls(
+            version, topics, keywords, docs_by_topic, aggregates,
+            topic_embeddings, document_embeddings, saved.get("_outliers", 0),
+        )
+
+    @property
+    def has_embeddings(self):
+        return self.topic_embeddings is not None and self.document_embeddings is not None
+
+    def documents_page(self, topic, page, page_size):
+        docs = self.docs_by_topic.get(topic, [])
+        start = (page - 1) * page_size
+        return {
+            "version": self.version,
+            "topic": topic,
+            "page": page,
+            "page_size": page_size,
+            "total": len(docs),
+            "documents": docs[start:start + page_size],
+        }
+
+    def representative_documents(self, topic, limit):
+        """Rank the documents of a topic by cosine similarity to the topic embedding."""
+        docs = self.docs_by_topic.get(topic, [])
+        centroid = np.asarray(self.topic_embeddings[topic + self.topic_offset], dtype=np.float32)
+        centroid = centroid / max(float(np.linalg.norm(centroid)), 1e-12)
+        # Hanya baris dokumen topik ini yang dibaca dari memmap (embedding dokumen sudah ternormalisasi)
+        rows = np.fromiter((doc["id"] for doc in docs), dtype=np.int64, count=len(docs))
+        scores = self.document_embeddings[rows] @ centroid
+        order = np.argsort(-scores, kind="stable")[:limit]
+        return {
+            "version": self.version,
+            "topic": topic,
+            "documents": [{**docs[i], "score": float(scores[i])} for i in order],
+        }
+
+    def aggregates_body(self, by, **filters):
+        rows = query_topic_aggregates(self.aggregates, by, **filters).to_json(orient="records")
+        return f'{{"version": "{self.version}", "by": "{by}", "rows": {rows}}}'.encode("utf-8")
+
+class TopicIndexCache:
+    """Hold the index of the current model and rebuild it when `model_link` changes."""
+
+    def __init__(self, model_link, refresh_seconds=BROWSE_REFRESH_SECONDS):
+        self.model_link = model_link
+        self.refresh_seconds = refresh_seconds
+        self._index = None
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def get(self):
+        if time.monotonic() - self._checked_at < self.refresh_seconds:
+            return self._index
+
+        with self._lock:
+            if time.monotonic() - self._checked_at < self.refresh_seconds:
+                return self._index
+            version = model_version(self.model_link)
+            if version is None:
+                self._index = None
+            elif self._index is None or self._index.version != version:
+                try:
+                    self._index = TopicIndex.build(os.path.realpath(self.model_link), version)
+                except Exception as e:
+                    logging.error(f"Failed to build topic index: {e}")
+                    self._index = None
+            self._checked_at = time.monotonic()
+            return self._index
+
+    def invalidate(self):
+        """Force the next request to re-check the model version."""
+        self._checked_at = float("-inf")
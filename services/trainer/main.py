@@ -1,7 +1,9 @@
-from fastapi import FastAPI, BackgroundTasks
+from typing import List, Optional
+from fastapi import FastAPI, BackgroundTasks, HTTPException, Query, Request
 from fastapi.responses import Response
 from pydantic import BaseModel
-from bert import compute_topics_with_bertopic, compute_coherence_score, PAPERS_DATA_PATH, run_id
+from bert import compute_topics_with_bertopic, compute_coherence_score, tokenize_texts, PAPERS_DATA_PATH, SYMLINK_PATH, run_id
+from browse import TopicIndexCache
 from prometheus_client import generate_latest, CONTENT_TYPE_LATEST, REGISTRY
 import json, argparse
 from pathlib import Path
@@ -12,6 +14,9 @@ app = FastAPI()
 BASE_PATH = Path(__file__).parent.resolve()
 RESULT_PATH = BASE_PATH.parent / "runs" / run_id / "train_result.json"
 
+# Index topik di memori, dibangun ulang saat runs/topic_model berubah
+topic_index = TopicIndexCache(SYMLINK_PATH)
+
 class TrainResponse(BaseModel):
     message: str
 
@@ -40,9 +45,10 @@ def train_job():
             }
         else:
             papers = json.loads(PAPERS_DATA_PATH.read_text(encoding="utf-8"))
-            tokenized_titles = [paper["title"].split() for paper in papers]
+            # Coherence dihitung pada teks yang sama dengan yang dimodelkan (TEXT_FIELDS)
+            tokenized_texts = tokenize_texts(papers)
             topic_model, topics = compute_topics_with_bertopic(papers)
-            coherence = compute_coherence_score(topic_model, tokenized_titles)
+            coherence = compute_coherence_score(topic_model, tokenized_texts)
             num_topics = len(topic_model.get_topic_info())
             result = {
                 "status": "done",
@@ -51,6 +57,7 @@ def train_job():
                 "coherence_score": coherence
             }
         RESULT_PATH.write_text(json.dumps(result, indent=2))
+        topic_index.invalidate()
     except Exception as e:
         RESULT_PATH.write_text(json.dumps({
             "status": "error",
@@ -77,6 +84,73 @@ def get_result():
     except Exception as e:
         return {"message": str(e), "num_topics": 0, "coherence_score": 0.0}
 
+def _current_index():
+    index = topic_index.get()
+    if index is None:
+        raise HTTPException(status_code=404, detail="No trained topic model found. Please run /train first.")
+    return index
+
+def _conditional_response(request, index, content):
+    """Return 304 if the client already has this model version, otherwise the JSON body."""
+    headers = {"ETag": index.etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if index.etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=content, media_type="application/json", headers=headers)
+
+@app.get("/topics")
+def list_topics(request: Request):
+    index = _current_index()
+    return _conditional_response(request, index, index.topics_body)
+
+@app.get("/topics/{topic_id}")
+def get_topic(topic_id: int, request: Request):
+    index = _current_index()
+    if topic_id not in index.topic_bodies:
+        raise HTTPException(status_code=404, detail=f"Topic {topic_id} not found.")
+    return _conditional_response(request, index, index.topic_bodies[topic_id])
+
+@app.get("/topics/{topic_id}/documents")
+def get_topic_documents(
+    topic_id: int,
+    request: Request,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=200)
+):
+    index = _current_index()
+    if topic_id not in index.topic_bodies:
+        raise HTTPException(status_code=404, detail=f"Topic {topic_id} not found.")
+    content = json.dumps(index.documents_page(topic_id, page, page_size)).encode("utf-8")
+    return _conditional_response(request, index, content)
+
+@app.get("/topics/{topic_id}/representative")
+def get_representative_documents(topic_id: int, request: Request, limit: int = Query(10, ge=1, le=100)):
+    index = _current_index()
+    if topic_id not in index.topic_bodies:
+        raise HTTPException(status_code=404, detail=f"Topic {topic_id} not found.")
+    if not index.has_embeddings:
+        raise HTTPException(status_code=404, detail="No embeddings saved for the current model.")
+    content = json.dumps(index.representative_documents(topic_id, limit)).encode("utf-8")
+    return _conditional_response(request, index, content)
+
+@app.get("/aggregates/{by}")
+def get_topic_aggregates(
+    by: str,
+    request: Request,
+    topic: Optional[List[int]] = Query(None),
+    key: Optional[List[str]] = Query(None),
+    year_from: Optional[int] = None,
+    year_to: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1)
+):
+    index = _current_index()
+    if by not in index.aggregates:
+        raise HTTPException(status_code=404, detail=f"No '{by}' aggregates for the current model.")
+    content = index.aggregates_body(
+        by, topics=topic, keys=key, year_from=year_from, year_to=year_to, limit=limit
+    )
+    return _conditional_response(request, index, content)
+
 @app.get("/monitoring")
 def prometheus_metrics():
     """
@@ -94,9 +168,9 @@ def main():
         return
 
     papers = json.loads(PAPERS_DATA_PATH.read_text(encoding="utf-8"))
-    tokenized_titles = [paper["title"].split() for paper in papers]
+    tokenized_texts = tokenize_texts(papers)
     topic_model, _ = compute_topics_with_bertopic(papers)
-    compute_coherence_score(topic_model, tokenized_titles)
+    compute_coherence_score(topic_model, tokenized_texts)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,81 @@
+import os
+import logging
+from contextlib import contextmanager
+from prometheus_client import Gauge
+
+def _available_cpus():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+# Budget CPU per job training (default: semua core yang boleh dipakai proses ini)
+CPU_BUDGET = int(os.environ.get("TRAINER_CPU_BUDGET", 0)) or _available_cpus()
+
+# Budget thread per stage, bisa di-override dengan TRAINER_THREADS_<STAGE>
+STAGES = ("encode", "fit", "predict", "coherence")
+STAGE_BUDGETS = {
+    stage: max(1, min(CPU_BUDGET, int(os.environ.get(f"TRAINER_THREADS_{stage.upper()}", CPU_BUDGET))))
+    for stage in STAGES
+}
+
+# Batas awal untuk pool BLAS/OpenMP/numba, dibaca saat library pertama kali diimpor
+for var in (
+    "OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS",
+    "NUMEXPR_NUM_THREADS", "VECLIB_MAXIMUM_THREADS", "NUMBA_NUM_THREADS",
+):
+    os.environ.setdefault(var, str(CPU_BUDGET))
+
+cpu_budget_metric = Gauge(
+    'trainer_cpu_budget',
+    'CPU/thread budget assigned to the training job'
+)
+stage_threads_metric = Gauge(
+    'trainer_stage_threads',
+    'Effective thread limit applied to torch, BLAS/OpenMP, numba and joblib per training stage',
+    ['stage']
+)
+cpu_budget_metric.set(CPU_BUDGET)
+for _stage, _threads in STAGE_BUDGETS.items():
+    stage_threads_metric.labels(stage=_stage).set(_threads)
+
+def _set_torch_threads(n):
+    try:
+        import torch
+    except ImportError:
+        return None
+    previous = torch.get_num_threads()
+    torch.set_num_threads(n)
+    return previous
+
+def _set_numba_threads(n):
+    try:
+        import numba
+    except ImportError:
+        return None
+    previous = numba.get_num_threads()
+    numba.set_num_threads(min(n, numba.config.NUMBA_NUM_THREADS))
+    return previous
+
+@contextmanager
+def thread_budget(stage):
+    """Limit torch, BLAS/OpenMP, numba and joblib to the thread budget of a training stage."""
+    from threadpoolctl import threadpool_limits
+    from joblib import parallel_config
+
+    n = STAGE_BUDGETS.get(stage, CPU_BUDGET)
+    previous_torch = _set_torch_threads(n)
+    previous_numba = _set_numba_threads(n)
+    logging.info(f"Stage '{stage}': thread budget {n} (job budget {CPU_BUDGET}).")
+    try:
+        with threadpool_limits(limits=n), parallel_config(n_jobs=n):
+            yield n
+    finally:
+        if previous_torch is not None:
+            _set_torch_threads(previous_torch)
+        if previous_numba is not None:
+            _set_numba_threads(previous_numba)
+
+def effective_settings():
+    """Return the CPU budget and per-stage thread limits, e.g. for experiment tracking."""
+    return {"cpu_budget": CPU_BUDGET, **{f"threads_{stage}": n for stage, n in STAGE_BUDGETS.items()}}
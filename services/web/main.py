@@ -1,4 +1,5 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response
 from pydantic import BaseModel
 import requests
 
@@ -8,8 +9,13 @@ SCRAPER_URL = "http://scraper:8000/scrape"
 PREPROCESSOR_URL = "http://preprocessor:8000/preprocess"
 TRAINER_URL = "http://trainer:8000/train"
 TRAINER_RESULT_URL = "http://trainer:8000/result"
+TRAINER_TOPICS_URL = "http://trainer:8000/topics"
+TRAINER_AGGREGATES_URL = "http://trainer:8000/aggregates"
 MONITORING_URL = "http://monitoring:8000/monitoring"
 
+# Koneksi keep-alive ke trainer untuk endpoint yang sering di-poll
+trainer_session = requests.Session()
+
 class ScrapeRequest(BaseModel):
     title_per_page: int = 100
     max_pages: int = 1
@@ -55,4 +61,44 @@ def get_train_result():
         resp = requests.get(MONITORING_URL, timeout=10)
         return resp.json()
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to get training result: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to get training result: {e}")
+
+def proxy_topics(url, request: Request):
+    """Forward a topic browsing request, passing conditional headers and ETag through."""
+    headers = {}
+    if "if-none-match" in request.headers:
+        headers["If-None-Match"] = request.headers["if-none-match"]
+    try:
+        resp = trainer_session.get(url, params=list(request.query_params.multi_items()), headers=headers, timeout=10)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get topics: {e}")
+
+    passthrough = {k: v for k, v in resp.headers.items() if k.lower() in ("etag", "cache-control")}
+    if resp.status_code == 304:
+        return Response(status_code=304, headers=passthrough)
+    return Response(
+        content=resp.content,
+        status_code=resp.status_code,
+        media_type=resp.headers.get("content-type", "application/json"),
+        headers=passthrough
+    )
+
+@app.get("/topics")
+def list_topics(request: Request):
+    return proxy_topics(TRAINER_TOPICS_URL, request)
+
+@app.get("/topics/{topic_id}")
+def get_topic(topic_id: int, request: Request):
+    return proxy_topics(f"{TRAINER_TOPICS_URL}/{topic_id}", request)
+
+@app.get("/topics/{topic_id}/documents")
+def get_topic_documents(topic_id: int, request: Request):
+    return proxy_topics(f"{TRAINER_TOPICS_URL}/{topic_id}/documents", request)
+
+@app.get("/topics/{topic_id}/representative")
+def get_representative_documents(topic_id: int, request: Request):
+    return proxy_topics(f"{TRAINER_TOPICS_URL}/{topic_id}/representative", request)
+
+@app.get("/aggregates/{by}")
+def get_topic_aggregates(by: str, request: Request):
+    return proxy_topics(f"{TRAINER_AGGREGATES_URL}/{by}", request)
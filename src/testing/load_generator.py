@@ -0,0 +1,120 @@
+import json
+import time
+import random
+import asyncio
+import argparse
+
+# Route gateway -> (method, path, body)
+def build_routes(args):
+    return {
+        "scrape": ("POST", "/scrape", {"title_per_page": args.title_per_page, "max_pages": args.max_pages}),
+        "preprocess": ("POST", "/preprocess", {"filename": args.filename}),
+        "train": ("POST", "/train", None),
+        "result": ("GET", "/result", None),
+    }
+
+def parse_mix(mix):
+    """Parse "result:8,train:1" into {"result": 8.0, "train": 1.0}."""
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.strip().partition(":")
+        if name:
+            weights[name] = float(weight or 1)
+    return weights
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(q / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def summarize(samples, elapsed):
+    """Aggregate (route, latency_seconds, ok) samples into per-route latency percentiles and throughput."""
+    report = {}
+    for route in sorted({route for route, _, _ in samples}):
+        latencies = sorted(latency for r, latency, _ in samples if r == route)
+        errors = sum(1 for r, _, ok in samples if r == route and not ok)
+        report[route] = {
+            "requests": len(latencies),
+            "errors": errors,
+            "throughput_rps": len(latencies) / elapsed if elapsed > 0 else 0.0,
+            "mean_ms": 1000 * sum(latencies) / len(latencies),
+            **{f"p{q}_ms": 1000 * percentile(latencies, q) for q in (50, 90, 95, 99)},
+            "max_ms": 1000 * latencies[-1],
+        }
+    return {"elapsed_seconds": elapsed, "total_requests": len(samples), "routes": report}
+
+async def worker(client, routes, weights, deadline, remaining, samples, rng):
+    names = list(weights)
+    while time.monotonic() < deadline:
+        if remaining is not None:
+            if remaining[0] <= 0:
+                return
+            remaining[0] -= 1
+        name = rng.choices(names, weights=[weights[n] for n in names])[0]
+        method, path, body = routes[name]
+        start = time.perf_counter()
+        try:
+            resp = await client.request(method, path, json=body)
+            ok = resp.status_code < 400
+        except Exception:
+            ok = False
+        samples.append((name, time.perf_counter() - start, ok))
+
+async def run_load(args):
+    import httpx
+
+    routes = build_routes(args)
+    weights = parse_mix(args.mix)
+    unknown = set(weights) - set(routes)
+    if unknown:
+        raise SystemExit(f"Unknown routes: {', '.join(sorted(unknown))}")
+
+    samples = []
+    remaining = [args.requests] if args.requests else None
+    deadline = time.monotonic() + args.duration
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    start = time.monotonic()
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        await asyncio.gather(*[
+            worker(client, routes, weights, deadline, remaining, samples, random.Random(args.seed + i))
+            for i in range(args.concurrency)
+        ])
+    return summarize(samples, time.monotonic() - start)
+
+def print_report(report):
+    print(f"{report['total_requests']} requests in {report['elapsed_seconds']:.1f}s")
+    header = f"{'route':<12}{'reqs':>8}{'errors':>8}{'rps':>9}{'mean':>9}{'p50':>9}{'p90':>9}{'p95':>9}{'p99':>9}{'max':>9}"
+    print(header)
+    for route, stats in report["routes"].items():
+        print(
+            f"{route:<12}{stats['requests']:>8}{stats['errors']:>8}{stats['throughput_rps']:>9.1f}"
+            f"{stats['mean_ms']:>9.1f}{stats['p50_ms']:>9.1f}{stats['p90_ms']:>9.1f}"
+            f"{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}{stats['max_ms']:>9.1f}"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description="Async load generator for the KATARSIS gateway")
+    parser.add_argument("--base-url", default="http://localhost:8000", help="Gateway base URL")
+    parser.add_argument("--mix", default="result", help='Weighted routes, e.g. "result:8,scrape:1,train:1"')
+    parser.add_argument("--concurrency", type=int, default=8, help="Number of concurrent clients")
+    parser.add_argument("--requests", type=int, default=0, help="Total requests (0 = run for --duration)")
+    parser.add_argument("--duration", type=float, default=30, help="Maximum run time in seconds")
+    parser.add_argument("--timeout", type=float, default=600, help="Per-request timeout in seconds")
+    parser.add_argument("--title_per_page", type=int, default=10, help="Body for /scrape")
+    parser.add_argument("--max_pages", type=int, default=1, help="Body for /scrape")
+    parser.add_argument("--filename", default="mit_scraped_10.json", help="Body for /preprocess")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the report as JSON to this path")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_load(args))
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
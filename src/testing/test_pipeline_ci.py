@@ -1,11 +1,25 @@
 import json
 import pytest
 import sys
+import numpy as np
 from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parents[2]))  # Tambahkan root project ke path
+sys.path.append(str(Path(__file__).resolve().parents[2] / "services" / "trainer"))  # Modul lokal service (resources, browse)
+sys.path.append(str(Path(__file__).resolve().parents[2] / "services" / "common"))  # Modul bersama (encoder)
 
-from services.preprocessor.preprocessing import clean_text, preprocess_papers
-from services.trainer.bert import compute_topics_with_bertopic
+from services.preprocessor.preprocessing import clean_text, clean_texts, preprocess_papers
+import encoder
+from encoder import chunk_text, length_buckets, encode_texts, open_encoder_pool, validate_backend, load_sentence_encoder
+from resources import thread_budget, effective_settings, STAGE_BUDGETS
+from browse import TopicIndexCache
+from artifacts import load_safetensors_mmap
+from aggregates import compute_topic_aggregates, query_topic_aggregates
+from services.mockdspace.main import TokenBucket, render_discover, render_item, synthetic_item
+from src.testing.load_generator import summarize, parse_mix
+from services.trainer.bert import (
+    compute_topics_with_bertopic, stratified_sample_indices, save_topic_model,
+    fit_large_corpus, load_embedding_model, tokenize_texts, MODEL_LOCAL_PATH
+)
 
 
 def test_clean_text_basic():
@@ -14,6 +28,26 @@ def test_clean_text_basic():
     assert isinstance(cleaned, str)
     assert "test" in cleaned
 
+def test_preprocessing_uses_per_field_pipelines(tmp_path):
+    papers = [{
+        "title": "Learning 3D Shapes, Quickly!",
+        "authors": ["José Müller", "O'Neil, Ann"],
+        "publisher": "Springer-Verlag",
+        "year": "2023",
+        "doi": "https://hdl.handle.net/1721.1/12345",
+    }]
+    cleaned = preprocess_papers(papers, output_path=tmp_path / "preprocessed.json")[0]
+    assert cleaned["year"] == "2023"
+    assert cleaned["doi"] == "https://hdl.handle.net/1721.1/12345"
+    assert cleaned["publisher"] == "springer verlag"
+    assert cleaned["authors"] == "josé müller o neil ann"
+    assert "3" not in cleaned["title"] and "learning" in cleaned["title"]
+
+def test_clean_texts_isolates_failing_value():
+    cleaned = clean_texts(["Neural networks", None, "Quantum computing"])
+    assert cleaned[1] == ""
+    assert "neural" in cleaned[0] and "quantum" in cleaned[2]
+
 def test_preprocessing_minimal_data(tmp_path):
     papers = [
         {"title": "Deep Learning for NLP", "authors": ["John Doe", "Jane Smith"]},
@@ -25,20 +59,300 @@ def test_preprocessing_minimal_data(tmp_path):
     assert len(cleaned) == 2
     assert out_path.exists()
 
+SAMPLE_PAPERS = [
+    {"title": "deep learning for nlp", "authors": ["john doe"]},
+    {"title": "transformers in computer vision", "authors": ["jane smith"]},
+    {"title": "reinforcement learning applications", "authors": ["alice johnson"]},
+    {"title": "quantum computing basics", "authors": ["bob lee"]},
+    {"title": "graph neural networks", "authors": ["charlie kim"]},
+    {"title": "large language models", "authors": ["dave park"]},
+    {"title": "text summarization techniques", "authors": ["emily clark"]},
+    {"title": "zero shot learning", "authors": ["frank martin"]},
+    {"title": "semi supervised learning", "authors": ["grace hall"]},
+    {"title": "explainable ai methods", "authors": ["henry young"]}
+]
+
 def test_topic_modeling_runs():
-    papers = [
-        {"title": "deep learning for nlp", "authors": ["john doe"]},
-        {"title": "transformers in computer vision", "authors": ["jane smith"]},
-        {"title": "reinforcement learning applications", "authors": ["alice johnson"]},
-        {"title": "quantum computing basics", "authors": ["bob lee"]},
-        {"title": "graph neural networks", "authors": ["charlie kim"]},
-        {"title": "large language models", "authors": ["dave park"]},
-        {"title": "text summarization techniques", "authors": ["emily clark"]},
-        {"title": "zero shot learning", "authors": ["frank martin"]},
-        {"title": "semi supervised learning", "authors": ["grace hall"]},
-        {"title": "explainable ai methods", "authors": ["henry young"]}
-    ]
+    papers = SAMPLE_PAPERS
     model, topics = compute_topics_with_bertopic(papers)
     assert hasattr(model, "get_topic")
     assert isinstance(topics, list)
     assert len(topics) == len(papers)
+
+def test_topic_model_artifact_roundtrip(tmp_path):
+    model, _ = compute_topics_with_bertopic(SAMPLE_PAPERS, save_model=False)
+    size = save_topic_model(model, tmp_path / "bertopic_model")
+    assert size > 0
+    assert (tmp_path / "bertopic_model" / "topics.json").exists()
+    from bertopic import BERTopic
+
+    loaded = BERTopic.load(str(tmp_path / "bertopic_model"), embedding_model=MODEL_LOCAL_PATH)
+    assert loaded.get_topic_info()["Count"].tolist() == model.get_topic_info()["Count"].tolist()
+
+def test_large_corpus_mode_assigns_every_document():
+    themes = [
+        ["quantum", "qubit", "entanglement", "photon"],
+        ["protein", "enzyme", "genome", "cell"],
+        ["market", "inflation", "monetary", "trade"],
+        ["robot", "controller", "actuator", "navigation"],
+    ]
+    papers = [
+        {"title": " ".join(themes[i % 4][(i + k) % 4] for k in range(3)) + f" study {i % 7}",
+         "year": str(2018 + i % 5)}
+        for i in range(400)
+    ]
+    texts = [paper["title"] for paper in papers]
+    topic_model = fit_large_corpus(texts, papers, load_embedding_model(), sample_size=100, batch_size=60)
+
+    assert len(topic_model.topics_) == len(papers)
+    assert sum(topic_model.topic_sizes_.values()) == len(papers)
+    assert topic_model.c_tf_idf_.shape[0] == len(topic_model.topic_sizes_)
+    info = topic_model.get_topic_info()
+    assert info["Count"].sum() == len(papers)
+    assert all(topic_model.get_topic(t) for t in topic_model.topic_sizes_)
+    topics, _ = topic_model.transform(texts[:5])
+    assert len(topics) == 5
+
+def test_tokenize_texts_splits_each_field():
+    papers = [{"title": "graph neural network", "abstract": "message passing model"}]
+    tokens = tokenize_texts(papers, fields=["title", "abstract"])[0]
+    assert tokens == ["graph", "neural", "network", "message", "passing", "model"]
+
+def test_stratified_sample_covers_every_year():
+    papers = [{"title": f"paper {i}", "year": "2020" if i < 90 else "2021"} for i in range(100)]
+    sample = stratified_sample_indices(papers, 10, key="year")
+    assert len(sample) <= 10
+    assert len(set(sample)) == len(sample)
+    assert {papers[i]["year"] for i in sample} == {"2020", "2021"}
+
+def test_chunk_text_splits_long_abstracts():
+    text = " ".join(f"w{i}" for i in range(300))
+    chunks = chunk_text(text, chunk_words=128, overlap=16)
+    assert len(chunks) == 3
+    assert chunks[0].split()[0] == "w0"
+    assert chunks[-1].split()[-1] == "w299"
+    assert chunk_text("short title") == ["short title"]
+
+def test_length_buckets_respect_token_budget():
+    lengths = [5, 100, 7, 90, 6, 110]
+    batches = length_buckets(lengths, token_budget=200, max_batch_size=4)
+    assert sorted(i for batch in batches for i in batch) == list(range(len(lengths)))
+    for batch in batches:
+        assert len(batch) * max(lengths[i] for i in batch) <= 200 or len(batch) == 1
+
+class _StubEncoder:
+    """Deterministic bag-of-characters encoder standing in for a SentenceTransformer."""
+
+    def __init__(self, noise=0.0, backend="torch"):
+        self.noise = noise
+        self.backend = backend
+
+    def get_sentence_embedding_dimension(self):
+        return 26
+
+    def encode(self, texts, batch_size=None, show_progress_bar=False, normalize_embeddings=True):
+        vectors = np.zeros((len(texts), 26), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for char in text.lower():
+                if "a" <= char <= "z":
+                    vectors[row, ord(char) - ord("a")] += 1
+        # Gangguan yang makin besar per baris, meniru backend yang menyimpang
+        vectors[:, 0] += self.noise * np.arange(1, len(texts) + 1)
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+class _InProcessPool:
+    """Records how often a persistent encoder pool is reused."""
+
+    def __init__(self, model):
+        self.model = model
+        self.calls = 0
+
+    def encode(self, texts_per_batch):
+        self.calls += 1
+        return [self.model.encode(texts) for texts in texts_per_batch]
+
+def test_encode_texts_reuses_persistent_pool():
+    model = _StubEncoder()
+    pool = _InProcessPool(model)
+    texts = [f"paper about topic {i}" for i in range(300)]
+    first = encode_texts(texts, model, pool=pool)
+    second = encode_texts(texts[::-1], model, pool=pool)
+    assert pool.calls == 2
+    np.testing.assert_allclose(first, encode_texts(texts, model, workers=1), atol=1e-6)
+    np.testing.assert_allclose(second[::-1], first, atol=1e-6)
+    assert open_encoder_pool(model, "unused-path", workers=1) is None
+
+def test_validate_backend_reports_cosine_agreement():
+    same = validate_backend(_StubEncoder(), _StubEncoder(), ["graph networks", "quantum codes"])
+    assert same["num_texts"] == 2
+    assert same["min_cosine"] == pytest.approx(1.0, abs=1e-6)
+    drifted = validate_backend(_StubEncoder(), _StubEncoder(noise=5.0), ["graph networks", "quantum codes"])
+    assert drifted["min_cosine"] < drifted["mean_cosine"] < 0.98
+
+@pytest.fixture
+def stub_onnx(tmp_path, monkeypatch):
+    """Replace model loading and ONNX export with stubs; `noise` sets the ONNX drift."""
+    settings = {"noise": 0.0, "export_error": None}
+
+    def fake_export(model_path):
+        if settings["export_error"]:
+            raise settings["export_error"]
+        return tmp_path / "model_qint8_avx2.onnx"
+
+    def fake_open(model_path, backend, num_threads=None):
+        return _StubEncoder(noise=settings["noise"] if backend == "onnx" else 0.0, backend=backend)
+
+    monkeypatch.setattr(encoder, "export_quantized_onnx", fake_export)
+    monkeypatch.setattr(encoder, "_open_model", fake_open)
+    settings["report_path"] = tmp_path / "model_qint8_avx2.validation.json"
+    return settings
+
+def test_onnx_backend_used_when_it_agrees(stub_onnx):
+    model, backend = load_sentence_encoder("model", backend="onnx")
+    assert backend == "onnx" and model.backend == "onnx"
+    assert json.loads(stub_onnx["report_path"].read_text())["min_cosine"] >= encoder.ONNX_MIN_COSINE
+
+def test_onnx_falls_back_to_torch_on_disagreement(stub_onnx):
+    stub_onnx["noise"] = 5.0
+    model, backend = load_sentence_encoder("model", backend="onnx")
+    assert backend == "torch" and model.backend == "torch"
+
+def test_onnx_falls_back_to_torch_on_export_failure(stub_onnx):
+    stub_onnx["export_error"] = RuntimeError("onnxruntime missing")
+    model, backend = load_sentence_encoder("model", backend="onnx")
+    assert backend == "torch" and model.backend == "torch"
+
+def test_cached_onnx_report_uses_current_threshold(stub_onnx, monkeypatch):
+    stub_onnx["report_path"].write_text(json.dumps({"mean_cosine": 0.985, "min_cosine": 0.975, "num_texts": 64}))
+
+    def fail_validate(*args, **kwargs):
+        raise AssertionError("cached report should not be re-validated")
+
+    monkeypatch.setattr(encoder, "validate_backend", fail_validate)
+    monkeypatch.setattr(encoder, "ONNX_MIN_COSINE", 0.98)
+    assert load_sentence_encoder("model", backend="onnx")[1] == "torch"
+    monkeypatch.setattr(encoder, "ONNX_MIN_COSINE", 0.97)
+    assert load_sentence_encoder("model", backend="onnx")[1] == "onnx"
+
+def test_thread_budget_applies_stage_limit():
+    from threadpoolctl import threadpool_info
+
+    with thread_budget("fit") as n:
+        assert n == STAGE_BUDGETS["fit"]
+        assert all(pool["num_threads"] <= n for pool in threadpool_info())
+    assert effective_settings()["threads_fit"] == STAGE_BUDGETS["fit"]
+
+def _write_run(run_dir, keyword):
+    model_dir = run_dir / "bertopic_model"
+    model_dir.mkdir(parents=True)
+    (model_dir / "topics.json").write_text(json.dumps({
+        "topic_representations": {"-1": [["misc", 0.1]], "0": [[keyword, 0.9], ["learning", 0.5]]},
+        "topic_sizes": {"-1": 1, "0": 2},
+        "topic_labels": {"-1": "-1_misc", "0": f"0_{keyword}_learning"},
+    }))
+    (run_dir / "documents.json").write_text(json.dumps([
+        {"id": i, "topic": t, "title": f"paper {i}", "year": "2024", "doi": ""}
+        for i, t in enumerate([0, -1, 0])
+    ]))
+    return model_dir
+
+def test_topic_index_cache_follows_model_symlink(tmp_path):
+    link = tmp_path / "topic_model"
+    link.symlink_to(_write_run(tmp_path / "run_a", "deep"))
+    cache = TopicIndexCache(link, refresh_seconds=3600)
+
+    index = cache.get()
+    assert json.loads(index.topics_body)["topics"][1]["keywords"] == ["deep", "learning"]
+    page = index.documents_page(0, page=2, page_size=1)
+    assert page["total"] == 2 and [d["id"] for d in page["documents"]] == [2]
+    assert cache.get() is index
+
+    link.unlink()
+    link.symlink_to(_write_run(tmp_path / "run_b", "quantum"))
+    assert cache.get() is index  # belum dicek ulang
+    cache.invalidate()
+    new_index = cache.get()
+    assert new_index.etag != index.etag
+    assert json.loads(new_index.topic_bodies[0])["keywords"][0]["word"] == "quantum"
+
+    # Training ulang dalam proses yang sama menimpa file di direktori yang sama
+    topics_path = tmp_path / "run_b" / "bertopic_model" / "topics.json"
+    saved = json.loads(topics_path.read_text())
+    saved["topic_representations"]["0"][0] = ["photon", 0.8]
+    topics_path.write_text(json.dumps(saved))
+    cache.invalidate()
+    assert json.loads(cache.get().topic_bodies[0])["keywords"][0]["word"] == "photon"
+
+def test_topic_index_memory_maps_embeddings(tmp_path):
+    from safetensors.numpy import save_file
+
+    model_dir = _write_run(tmp_path / "run_a", "deep")
+    saved = json.loads((model_dir / "topics.json").read_text())
+    saved["_outliers"] = 1
+    (model_dir / "topics.json").write_text(json.dumps(saved))
+    topic_vectors = np.array([[1.0, 0.0], [0.8, 0.6]], dtype=np.float32)
+    save_file({"topic_embeddings": topic_vectors, "ids": np.arange(3, dtype=np.int64)},
+              str(model_dir / "topic_embeddings.safetensors"))
+    np.save(tmp_path / "run_a" / "embeddings.npy", np.array([[0.0, 1.0], [1.0, 0.0], [0.6, 0.8]], dtype=np.float32))
+
+    arrays = load_safetensors_mmap(model_dir / "topic_embeddings.safetensors")
+    assert isinstance(arrays["topic_embeddings"], np.memmap)
+    np.testing.assert_array_equal(arrays["topic_embeddings"], topic_vectors)
+    np.testing.assert_array_equal(arrays["ids"], [0, 1, 2])
+
+    link = tmp_path / "topic_model"
+    link.symlink_to(model_dir)
+    index = TopicIndexCache(link, refresh_seconds=3600).get()
+    assert index.has_embeddings and isinstance(index.document_embeddings, np.memmap)
+    ranked = index.representative_documents(0, limit=5)["documents"]
+    assert [d["id"] for d in ranked] == [2, 0]
+    assert ranked[0]["score"] == pytest.approx(0.96)
+
+def test_topic_aggregates_by_year_and_venue():
+    papers = [
+        {"title": "a", "year": "2020", "journal_conference_name": "Nature", "publisher": "Springer"},
+        {"title": "b", "year": "2020", "journal_conference_name": "Nature", "publisher": "Springer"},
+        {"title": "c", "year": "2021", "journal_conference_name": "Science", "publisher": ""},
+        {"title": "d", "year": "", "journal_conference_name": "Nature", "publisher": "Springer"},
+        {"title": "e", "year": "2022", "journal_conference_name": "No Journal/Conference", "publisher": "No Publisher"},
+        {"title": "f", "year": "2022", "journal_conference_name": "no journal conference", "publisher": "no publisher"},
+    ]
+    aggregates = compute_topic_aggregates(papers, [0, 1, 0, 0, 1, 1])
+    by_year = aggregates["year"]
+    assert by_year["count"].sum() == 5
+    assert by_year.loc[(by_year["year"] == 2020) & (by_year["topic"] == 0), "share"].item() == 0.5
+    assert aggregates["venue"]["count"].sum() == 4
+    assert aggregates["publisher"]["count"].sum() == 3
+
+    venues = query_topic_aggregates(aggregates, "venue", topics=[0])
+    assert venues.iloc[0]["venue"] == "Nature" and venues.iloc[0]["count"] == 2
+    recent = query_topic_aggregates(aggregates, "year", year_from=2021)
+    assert recent["year"].tolist() == [2021]
+
+def test_mock_dspace_pages_match_scraper_selectors():
+    listing = render_discover(page=1, rpp=10)
+    assert listing.count('class="ds-artifact-item"') == 10
+    assert 'class="next-page-link"' in listing and "rpp=100" in listing
+
+    item = synthetic_item(3)
+    assert synthetic_item(3) == item
+    page = render_item(item)
+    for css_class in ("page-header", "simple-item-view-authors", "simple-item-view-description",
+                      "simple-item-view-journal", "simple-item-view-date", "simple-item-view-uri"):
+        assert css_class in page
+
+def test_mock_rate_limit_below_one_per_second():
+    bucket = TokenBucket(0.5)
+    assert bucket.allow()
+    assert not bucket.allow()
+    bucket.updated -= 2.0
+    assert bucket.allow()
+    assert not bucket.allow()
+
+def test_load_report_percentiles():
+    samples = [("result", i / 1000, i != 100) for i in range(1, 101)]
+    report = summarize(samples, elapsed=2.0)["routes"]["result"]
+    assert report["requests"] == 100 and report["errors"] == 1
+    assert report["throughput_rps"] == 50
+    assert round(report["p50_ms"]) == 50 and round(report["p99_ms"]) == 99
+    assert parse_mix("result:8,train") == {"result": 8.0, "train": 1.0}